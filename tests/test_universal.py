@@ -0,0 +1,564 @@
+"""
+Tests for signature sniffing, the JPEG/PNG metadata parsers, the cache and the scan.
+"""
+
+import io
+import logging
+import os
+import sqlite3
+import struct
+import wave
+import zlib
+
+import pytest
+from PIL import Image, PngImagePlugin
+
+import universal
+from universal import UniversalMetadataExtractor as Extractor
+
+
+def make_exif(make: str = 'Canon') -> Image.Exif:
+    exif = Image.Exif()
+    exif[0x010F] = make
+    return exif
+
+
+def make_jpeg(exif: Image.Exif = None) -> bytes:
+    buffer = io.BytesIO()
+    if exif is None:
+        Image.new('RGB', (8, 8), 'red').save(buffer, format='JPEG')
+    else:
+        Image.new('RGB', (8, 8), 'red').save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def make_png(pnginfo: PngImagePlugin.PngInfo = None, exif: Image.Exif = None) -> bytes:
+    buffer = io.BytesIO()
+    options = {}
+    if pnginfo is not None:
+        options['pnginfo'] = pnginfo
+    if exif is not None:
+        options['exif'] = exif
+    Image.new('RGB', (8, 8), 'red').save(buffer, format='PNG', **options)
+    return buffer.getvalue()
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+# ============================================================================
+# SIGNATURE DETECTION
+# ============================================================================
+
+@pytest.mark.parametrize('signature, expected', Extractor.MAGIC_SIGNATURES)
+def test_detect_format_magic_signatures(signature, expected):
+    assert Extractor.detect_format(signature + b'\x00' * 12) == expected
+
+
+@pytest.mark.parametrize('riff_magic', sorted(Extractor.RIFF_MAGICS))
+@pytest.mark.parametrize('subtype, expected', Extractor.RIFF_FORMATS.items())
+def test_detect_format_riff_formats(riff_magic, subtype, expected):
+    header = riff_magic + b'\x00\x00\x00\x00' + subtype + b'\x00\x00\x00\x00'
+    assert Extractor.detect_format(header) == expected
+
+
+@pytest.mark.parametrize('brand, expected', [
+    *((brand, 'm4a') for brand in sorted(Extractor.FTYP_AUDIO_BRANDS)),
+    *((brand, 'heic') for brand in sorted(Extractor.FTYP_IMAGE_BRANDS)),
+    (b'isom', 'mp4'),
+    (b'mp42', 'mp4'),
+    (b'qt  ', 'mp4'),
+])
+def test_detect_format_ftyp_brands(brand, expected):
+    assert Extractor.detect_format(b'\x00\x00\x00\x20ftyp' + brand + b'\x00' * 4) == expected
+
+
+@pytest.mark.parametrize('atom', sorted(Extractor.QUICKTIME_ATOMS))
+def test_detect_format_quicktime_without_ftyp(atom):
+    assert Extractor.detect_format(b'\x00\x00\x00\x08' + atom + b'\x00' * 8) == 'mp4'
+
+
+@pytest.mark.parametrize('frame_header', [
+    b'\xFF\xFB\x90\x00',  # MPEG-1 Layer III
+    b'\xFF\xFA\x90\x00',  # MPEG-1 Layer III with CRC
+    b'\xFF\xF3\x18\xC4',  # MPEG-2 Layer III
+    b'\xFF\xE3\x18\xC4',  # MPEG-2.5 Layer III
+])
+def test_detect_format_mpeg_frame_sync(frame_header):
+    assert Extractor.detect_format(frame_header + b'\x00' * 12) == 'mp3'
+
+
+@pytest.mark.parametrize('header', [
+    b'',
+    b'\xFF',
+    b'hello world!',
+    b'RIFF\x00\x00\x00\x00JUNK',
+    b'\xFF\xFE',  # UTF-16LE byte order mark
+    b'\xFF\xFEh\x00i\x00\r\x00\n\x00',  # UTF-16LE text
+    b'\xFF\xFE\x00\x00h\x00\x00\x00',  # UTF-32LE text
+    b'\xFE\xFFh\x00i\x00',  # UTF-16BE byte order mark
+    b'\xEF\xBB\xBFhello',  # UTF-8 byte order mark
+    b'\xFF\xE0\x00\x00',  # frame sync with reserved layer
+    b'\xFF\xFB\xF0\x00',  # invalid bitrate index
+    b'\xFF\xFB\x9C\x00',  # reserved sample rate
+    b'\xFF\xEB\x90\x00',  # reserved MPEG version
+])
+def test_detect_format_unknown(header):
+    assert Extractor.detect_format(header) is None
+
+
+def test_unknown_signature_falls_back_to_extension(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(Extractor, 'get_audio_metadata', lambda path, size=None: calls.append(path) or {})
+    file_path = tmp_path / 'song.mp3'
+    file_path.write_bytes(b'\x00' * 64)
+    
+    Extractor.get_all_metadata(file_path)
+    
+    assert calls == [file_path]
+
+
+def test_audio_extension_wins_over_generic_ftyp(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(Extractor, 'get_audio_metadata', lambda path, size=None: calls.append(path) or {})
+    monkeypatch.setattr(Extractor, 'get_video_metadata', lambda path, size=None: pytest.fail('video path'))
+    file_path = tmp_path / 'song.m4a'
+    file_path.write_bytes(b'\x00\x00\x00\x20ftypisom' + b'\x00' * 64)
+    
+    Extractor.get_all_metadata(file_path)
+    
+    assert calls == [file_path]
+
+
+def test_unreadable_file_is_distinguished_from_no_metadata(tmp_path):
+    file_path = tmp_path / 'notes.txt'
+    
+    assert Extractor.get_content_metadata(file_path) is None
+    
+    file_path.write_text('hello')
+    assert Extractor.get_content_metadata(file_path) == {}
+
+
+def test_recognized_signature_overrides_extension(tmp_path):
+    file_path = tmp_path / 'photo.mp3'
+    file_path.write_bytes(make_jpeg(make_exif('Nikon')))
+    
+    metadata = Extractor.get_all_metadata(file_path)
+    
+    assert metadata['IMG_Image Make'] == 'Nikon'
+
+
+# ============================================================================
+# JPEG FAST PATH
+# ============================================================================
+
+def test_fast_jpeg_exif_reads_app1():
+    tags = Extractor._fast_jpeg_exif(io.BytesIO(make_jpeg(make_exif())))
+    
+    assert str(tags['Image Make']) == 'Canon'
+
+
+def test_fast_jpeg_exif_skips_xmp_app1_before_exif():
+    jpeg = make_jpeg(make_exif())
+    xmp = b'http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>'
+    segment = b'\xFF\xE1' + struct.pack('>H', len(xmp) + 2) + xmp
+    
+    tags = Extractor._fast_jpeg_exif(io.BytesIO(jpeg[:2] + segment + jpeg[2:]))
+    
+    assert str(tags['Image Make']) == 'Canon'
+
+
+def test_fast_jpeg_exif_without_app1():
+    assert Extractor._fast_jpeg_exif(io.BytesIO(make_jpeg())) == {}
+
+
+@pytest.mark.parametrize('data', [b'', b'\xFF\xD8', b'\xFF\xD8\xFF\xE0\x00', b'\x89PNG\r\n\x1a\n'])
+def test_fast_jpeg_exif_unparseable(data):
+    assert Extractor._fast_jpeg_exif(io.BytesIO(data)) is None
+
+
+# ============================================================================
+# PNG FAST PATH
+# ============================================================================
+
+def test_fast_png_metadata_reads_exif_and_text():
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Title', 'hello')
+    
+    tags = Extractor._fast_png_metadata(io.BytesIO(make_png(info, make_exif('Nikon'))))
+    
+    assert str(tags['Image Make']) == 'Nikon'
+    assert tags['PNG Title'] == 'hello'
+
+
+def test_fast_png_metadata_compressed_itxt():
+    info = PngImagePlugin.PngInfo()
+    info.add_itxt('Comment', 'ünïcode ' * 20, lang='en', tkey='Kommentar', zip=True)
+    png = make_png(info)
+    assert b'iTXt' in png
+    
+    tags = Extractor._fast_png_metadata(io.BytesIO(png))
+    
+    assert tags['PNG Comment'] == 'ünïcode ' * 20
+
+
+def test_fast_png_metadata_uncompressed_itxt():
+    png = make_png()
+    itxt = png_chunk(b'iTXt', b'Author\x00\x00\x00\x00\x00J\xc3\xb6rg')
+    
+    tags = Extractor._fast_png_metadata(io.BytesIO(png[:33] + itxt + png[33:]))
+    
+    assert tags['PNG Author'] == 'Jörg'
+
+
+def test_fast_png_metadata_truncated():
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Title', 'hello')
+    png = make_png(info)
+    
+    assert Extractor._fast_png_metadata(io.BytesIO(png[:-20])) is None
+
+
+def test_truncated_png_does_not_raise(tmp_path):
+    file_path = tmp_path / 'broken.png'
+    file_path.write_bytes(make_png()[:40])
+    
+    assert Extractor.get_image_metadata(file_path) == {}
+
+
+# ============================================================================
+# WANTED TAGS
+# ============================================================================
+
+@pytest.mark.parametrize('wanted, expected', [
+    ({'Make'}, 'Make'),  # IFD0
+    ({'Make', 'DateTimeOriginal'}, 'DateTimeOriginal'),  # EXIF sub-IFD
+    ({'Make', 'GPSLatitude'}, 'GPSInfo'),  # GPS IFD, reached through its pointer
+    ({'Make', 'Bogus'}, universal.DEFAULT_STOP_TAG),  # unknown names scan everything
+])
+def test_stop_tag_for(wanted, expected):
+    assert Extractor._stop_tag_for(wanted) == expected
+
+
+@pytest.mark.parametrize('name, number', [
+    ('FlashEnergy', 0xA20B),
+    ('SpatialFrequencyResponse', 0xA20C),
+    ('ExposureIndex', 0xA215),
+])
+def test_duplicate_tag_names_map_to_highest_number(name, number):
+    assert Extractor.EXIF_TAG_NUMBERS[name] == number
+
+
+def test_get_image_metadata_filters_wanted_tags(tmp_path):
+    exif = make_exif('Canon')
+    exif[0x0110] = 'EOS'
+    exif.get_ifd(0x8769)[0x9003] = '2020:01:02 03:04:05'
+    exif.get_ifd(0x8769)[0xA434] = 'Lens'
+    exif.get_ifd(0x8825)[1] = 'N'
+    exif.get_ifd(0x8825)[2] = (1.0, 2.0, 3.0)
+    file_path = tmp_path / 'photo.jpg'
+    file_path.write_bytes(make_jpeg(exif))
+    
+    metadata = Extractor.get_image_metadata(
+        file_path, wanted={'Make', 'DateTimeOriginal', 'GPSLatitude', 'Bogus'}
+    )
+    
+    assert metadata == {
+        'IMG_Image Make': 'Canon',
+        'IMG_EXIF DateTimeOriginal': '2020:01:02 03:04:05',
+        'IMG_GPS GPSLatitude': '[1, 2, 3]',
+    }
+
+
+# ============================================================================
+# METADATA CACHE
+# ============================================================================
+
+def test_cache_round_trip_and_staleness(tmp_path):
+    file_path = tmp_path / 'a.txt'
+    file_path.write_text('hello')
+    stat_info = file_path.stat()
+    
+    cache = universal.MetadataCache(str(tmp_path / 'cache.sqlite'))
+    cache.put(file_path, stat_info, {'IMG_Image Make': 'Canon'})
+    cache.flush()
+    
+    assert cache.get(file_path, stat_info) == {'IMG_Image Make': 'Canon'}
+    
+    file_path.write_text('changed')
+    assert cache.get(file_path, file_path.stat()) is None
+    cache.close()
+
+
+def test_cache_version_mismatch_is_a_miss(tmp_path, monkeypatch):
+    file_path = tmp_path / 'a.txt'
+    file_path.write_text('hello')
+    stat_info = file_path.stat()
+    db_path = str(tmp_path / 'cache.sqlite')
+    
+    cache = universal.MetadataCache(db_path)
+    cache.put(file_path, stat_info, {'KEY': 'value'})
+    cache.close()
+    
+    monkeypatch.setattr(universal, 'CACHE_VERSION', universal.CACHE_VERSION + 1)
+    cache = universal.MetadataCache(db_path)
+    assert cache.get(file_path, stat_info) is None
+    cache.close()
+
+
+def test_cache_drops_unversioned_schema(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE metadata (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, blob BLOB)"
+    )
+    connection.commit()
+    connection.close()
+    
+    file_path = tmp_path / 'a.txt'
+    file_path.write_text('hello')
+    cache = universal.MetadataCache(db_path)
+    cache.put(file_path, file_path.stat(), {'KEY': 'value'})
+    cache.flush()
+    
+    assert cache.get(file_path, file_path.stat()) == {'KEY': 'value'}
+    cache.close()
+
+
+def test_cache_recreates_corrupt_database(tmp_path):
+    db_path = tmp_path / 'cache.sqlite'
+    db_path.write_bytes(b'garbage' * 100)
+    
+    file_path = tmp_path / 'a.txt'
+    file_path.write_text('hello')
+    cache = universal.MetadataCache(str(db_path))
+    cache.put(file_path, file_path.stat(), {'KEY': 'value'})
+    cache.flush()
+    
+    assert cache.get(file_path, file_path.stat()) == {'KEY': 'value'}
+    cache.close()
+
+
+# ============================================================================
+# AUDIO / VIDEO EXTRACTION
+# ============================================================================
+
+def test_tagless_wav_reports_stream_info(tmp_path):
+    file_path = tmp_path / 'tone.wav'
+    with wave.open(str(file_path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b'\x00\x00' * 800)
+    
+    metadata = Extractor.get_audio_metadata(file_path)
+    
+    assert metadata['AUDIO_TECH_sample_rate'] == '8000'
+    assert metadata['AUDIO_TECH_channels'] == '1'
+
+
+def test_bounded_hachoir_parse_drops_size_dependent_fields(tmp_path, monkeypatch):
+    frame = b'\xFF\xFB\x90\x00' + b'\x00' * 413  # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz
+    file_path = tmp_path / 'huge.mp3'
+    file_path.write_bytes(frame * 100)
+    monkeypatch.setattr(Extractor, 'PROBE_BYTES', len(frame) * 50)
+    
+    full = Extractor._hachoir_metadata(file_path, file_path.stat().st_size, 'AUDIO_')
+    bounded = Extractor._hachoir_metadata(file_path, Extractor.MAX_FULL_PARSE_BYTES + 1, 'AUDIO_')
+    
+    assert 'AUDIO_- Duration' in full
+    assert bounded['AUDIO_- Sample rate'] == full['AUDIO_- Sample rate']
+    assert not {'AUDIO_- Duration', 'AUDIO_- Bit rate', 'AUDIO_- Compression rate'} & bounded.keys()
+
+
+def test_bounded_hachoir_parse_closes_file_on_error(tmp_path, monkeypatch):
+    file_path = tmp_path / 'huge.mkv'
+    file_path.write_bytes(b'\x1AE\xDF\xA3' + b'\x00' * 64)
+    handles = []
+    
+    def tracking_open(*args, **kwargs):
+        handle = open(*args, **kwargs)
+        handles.append(handle)
+        return handle
+    
+    def failing_guess(stream):
+        raise RuntimeError("parser failure")
+    
+    monkeypatch.setattr(universal, 'open', tracking_open, raising=False)
+    monkeypatch.setattr(universal, 'guessParser', failing_guess)
+    
+    assert Extractor.get_video_metadata(file_path, size=Extractor.MAX_FULL_PARSE_BYTES + 1) == {}
+    assert handles and all(handle.closed for handle in handles)
+
+
+# ============================================================================
+# FILE MANAGER
+# ============================================================================
+
+def make_tree(root, files):
+    for relative, data in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return root
+
+
+def run_report(tmp_path, root, **options):
+    report_path = tmp_path / 'report.log'
+    reporter = universal.Reporter(str(report_path))
+    try:
+        universal.FileManager(str(root), **options).run(logging.getLogger('test'), reporter)
+    finally:
+        reporter.close()
+    return report_path.read_text(encoding='utf-8')
+
+
+def report_outline(report):
+    return [line for line in report.splitlines() if line.startswith(('DIRECTORY:', 'FILE:', 'PATH:'))]
+
+
+SAMPLE_TREE = {
+    'b.jpg': make_jpeg(make_exif('Nikon')),
+    'a.txt': b'hello',
+    'sub/c.jpg': make_jpeg(make_exif('Canon')),
+    'sub/deeper/d.txt': b'deep',
+    '.hidden/x.txt': b'hidden',
+    'node_modules/y.txt': b'vendored',
+    '.DS_Store': b'',
+    'scan.log': b'log',
+}
+
+SAMPLE_OUTLINE = [
+    'FILE: a.txt', 'PATH: a.txt',
+    'FILE: b.jpg', 'PATH: b.jpg',
+    'DIRECTORY: sub',
+    'FILE: c.jpg', f'PATH: sub{os.sep}c.jpg',
+    f'DIRECTORY: sub{os.sep}deeper',
+    'FILE: d.txt', f'PATH: sub{os.sep}deeper{os.sep}d.txt',
+]
+
+
+@pytest.mark.parametrize('parallel_threshold, batch_size, max_pending', [
+    (32, 16, 256),  # thread pool, one batch, nothing blocks
+    (32, 1, 1),  # every item waits for the one before it
+    (32, 3, 6),  # batches split across directories
+    (1, 2, 4),  # process pool with a tiny window
+])
+def test_run_reports_in_walk_order(tmp_path, monkeypatch, parallel_threshold, batch_size, max_pending):
+    root = make_tree(tmp_path / 'tree', SAMPLE_TREE)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(universal.FileManager, 'PARALLEL_THRESHOLD', parallel_threshold)
+    monkeypatch.setattr(universal.FileManager, 'BATCH_SIZE', batch_size)
+    monkeypatch.setattr(universal.FileManager, 'MAX_PENDING', max_pending)
+    
+    report = run_report(tmp_path, root, sort_files=True)
+    
+    assert report_outline(report) == SAMPLE_OUTLINE
+    assert report.count('IMG_Image Make: Nikon') == 1
+    assert report.count('IMG_Image Make: Canon') == 1
+    assert report.index('IMG_Image Make: Nikon') < report.index('DIRECTORY: sub')
+
+
+def test_run_mixes_cached_and_extracted_files(tmp_path):
+    root = make_tree(tmp_path / 'tree', SAMPLE_TREE)
+    cache = universal.MetadataCache(str(tmp_path / 'cache.sqlite'))
+    cached_path = root / 'sub' / 'c.jpg'
+    cache.put(cached_path, cached_path.stat(), {'IMG_Image Make': 'Cached'})
+    cache.flush()
+    
+    report = run_report(tmp_path, root, cache=cache, sort_files=True)
+    cache.close()
+    
+    assert report_outline(report) == SAMPLE_OUTLINE
+    assert 'IMG_Image Make: Cached' in report
+    assert 'IMG_Image Make: Canon' not in report
+    assert 'IMG_Image Make: Nikon' in report
+
+
+def test_run_does_not_cache_unreadable_files(tmp_path, monkeypatch):
+    root = make_tree(tmp_path / 'tree', {'a.txt': b'hello', 'b.txt': b'world'})
+    real_get_content_metadata = Extractor.get_content_metadata
+    monkeypatch.setattr(
+        Extractor, 'get_content_metadata',
+        lambda path, size=None: None if path.name == 'a.txt' else real_get_content_metadata(path, size)
+    )
+    cache = universal.MetadataCache(str(tmp_path / 'cache.sqlite'))
+    
+    run_report(tmp_path, root, cache=cache)
+    cache.flush()
+    
+    assert cache.get(root / 'a.txt', (root / 'a.txt').stat()) is None
+    assert cache.get(root / 'b.txt', (root / 'b.txt').stat()) == {}
+    cache.close()
+
+
+def test_iter_tree_streams_directory_listing(tmp_path, monkeypatch):
+    root = make_tree(tmp_path / 'tree', {f'{index:03d}.txt': b'' for index in range(100)})
+    real_scandir = os.scandir
+    scans = []
+    
+    class CountingScandir:
+        def __init__(self, path):
+            self.scan = real_scandir(path)
+            self.read = 0
+            scans.append(self)
+        
+        def __enter__(self):
+            return self
+        
+        def __exit__(self, *exc_info):
+            self.scan.close()
+        
+        def __iter__(self):
+            return self
+        
+        def __next__(self):
+            entry = next(self.scan)
+            self.read += 1
+            return entry
+    
+    monkeypatch.setattr(os, 'scandir', CountingScandir)
+    
+    walk = universal.FileManager(str(root))._iter_tree(root)
+    _, files = next(walk)
+    next(files)
+    
+    assert scans[0].read == 1
+
+
+def test_run_prunes_gitignored_entries(tmp_path):
+    pytest.importorskip('pathspec')
+    root = make_tree(tmp_path / 'tree', {
+        '.gitignore': b'build/\n*.tmp\n',
+        'keep.txt': b'keep',
+        'scratch.tmp': b'tmp',
+        'build/out.txt': b'built',
+        'src/main.txt': b'main',
+        'src/cache.tmp': b'tmp',
+    })
+    
+    report = run_report(tmp_path, root, sort_files=True)
+    
+    assert report_outline(report) == [
+        'FILE: keep.txt', 'PATH: keep.txt',
+        'DIRECTORY: src',
+        'FILE: main.txt', f'PATH: src{os.sep}main.txt',
+    ]
+
+def test_gitignore_with_non_utf8_bytes_still_loads(tmp_path):
+    pytest.importorskip('pathspec')
+    (tmp_path / '.gitignore').write_bytes(b'# caf\xe9\n*.tmp\n')
+    
+    manager = universal.FileManager(str(tmp_path))
+    
+    assert manager._gitignore is not None
+    assert manager._gitignore.match_file('a.tmp')
+
+
+def test_invalid_gitignore_pattern_is_not_fatal(tmp_path):
+    pytest.importorskip('pathspec')
+    (tmp_path / '.gitignore').write_text('!\n')
+    
+    assert universal.FileManager(str(tmp_path))._gitignore is None
@@ -3,41 +3,49 @@ Universal Metadata Extractor - A cross-platform tool for extracting metadata
 from various file types (images, audio, video) with detailed logging.
 """
 
+import io
 import os
 import sys
+import itertools
+import json
+import mmap
+import zlib
+import sqlite3
 import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, BinaryIO, Set, Iterator, Union, NamedTuple
 import exifread
+from exifread.tags import DEFAULT_STOP_TAG, EXIF_TAGS
 import mutagen
 from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
+from hachoir.parser import createParser, guessParser
+from hachoir.stream import InputIOStream
 from PIL import Image, UnidentifiedImageError
 
+try:
+    import pathspec  # Optional: honour .gitignore patterns
+except ImportError:
+    pathspec = None
+
+try:
+    import orjson  # Optional: faster cache serialization
+except ImportError:
+    orjson = None
+
 # ============================================================================
 # LOGGING CONFIGURATION
 # ============================================================================
 
-def setup_logging() -> tuple[logging.Logger, logging.Logger]:
+def setup_logging() -> logging.Logger:
     """
-    Configure dual logging system:
-    - Process logger: Console output for real-time monitoring
-    - Metadata logger: File output for detailed metadata reports
+    Configure the process logger: console output for real-time monitoring.
+    The detailed metadata report is written separately by Reporter.
     
     Returns:
-        tuple: (process_logger, metadata_logger)
+        process_logger
     """
-    # Metadata logger (writes to file)
-    metadata_handler = logging.FileHandler(
-        'metadata_report.log',
-        encoding='utf-8',
-        mode='w'
-    )
-    metadata_handler.setFormatter(logging.Formatter('%(message)s'))
-    metadata_logger = logging.getLogger('metadata')
-    metadata_logger.setLevel(logging.INFO)
-    metadata_logger.addHandler(metadata_handler)
-    
     # Process logger (console output)
     process_handler = logging.StreamHandler()
     process_handler.setFormatter(
@@ -45,9 +53,75 @@ def setup_logging() -> tuple[logging.Logger, logging.Logger]:
     )
     process_logger = logging.getLogger('process')
     process_logger.setLevel(logging.INFO)
+    process_logger.propagate = False
     process_logger.addHandler(process_handler)
     
-    return process_logger, metadata_logger
+    return process_logger
+
+
+# ============================================================================
+# METADATA REPORT
+# ============================================================================
+
+REPORT_FILE = 'metadata_report.log'
+REPORT_BUFFER_SIZE = 1 << 20  # 1 MiB write buffer for the metadata report
+MAX_LOGGED_VALUE_LEN = 500  # Longer metadata values are truncated in the report
+
+
+class Reporter:
+    """
+    Writes the plain-text metadata report straight to a buffered file.
+    The report is high-volume, so it bypasses the logging machinery entirely.
+    """
+    
+    def __init__(self, path: str = REPORT_FILE):
+        """
+        Open (and truncate) the report file.
+        
+        Args:
+            path: Location of the report file
+        """
+        self.path = path
+        self.fh = open(path, mode='w', encoding='utf-8', buffering=REPORT_BUFFER_SIZE)
+    
+    def write_dir_header(self, relative: str) -> None:
+        """
+        Write the banner that starts a directory's section.
+        
+        Args:
+            relative: Directory path relative to the scanned folder
+        """
+        separator = '=' * 80
+        self.fh.write(f"\n{separator}\nDIRECTORY: {relative}\n{separator}\n")
+    
+    def write_file(self, name: str, path: str, metadata: Dict[str, Any]) -> None:
+        """
+        Write one file's entry with its sorted metadata.
+        
+        Args:
+            name: File name
+            path: File path relative to the scanned folder
+            metadata: Extracted metadata (may be empty)
+        """
+        lines = [f"\nFILE: {name}", f"PATH: {path}"]
+        
+        if metadata:
+            lines.append("METADATA:")
+            for key in sorted(metadata.keys()):
+                value = str(metadata[key])
+                # Truncate very long values
+                if len(value) > MAX_LOGGED_VALUE_LEN:
+                    value = value[:MAX_LOGGED_VALUE_LEN - 3] + "..."
+                lines.append(f"  • {key}: {value}")
+        else:
+            lines.append("  • No extractable metadata found")
+        
+        lines.append("")
+        self.fh.write("\n".join(lines))
+    
+    def close(self) -> None:
+        """Flush and close the report file."""
+        self.fh.close()
 
 
 # ============================================================================
@@ -64,37 +138,348 @@ class UniversalMetadataExtractor:
     IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.webp', '.heic', '.bmp', '.gif'}
     AUDIO_EXTENSIONS = {'.mp3', '.flac', '.m4a', '.ogg', '.wav', '.aac', '.wma'}
     VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm'}
+    EXTENSION_FAMILIES = {
+        **dict.fromkeys(IMAGE_EXTENSIONS, 'image'),
+        **dict.fromkeys(AUDIO_EXTENSIONS, 'audio'),
+        **dict.fromkeys(VIDEO_EXTENSIONS, 'video'),
+    }
+    
+    # File signature (magic bytes) mappings
+    HEADER_SIZE = 16
+    MAGIC_SIGNATURES = (
+        (b'\xFF\xD8\xFF', 'jpeg'),
+        (b'\x89PNG', 'png'),
+        (b'II*\x00', 'tiff'),
+        (b'MM\x00*', 'tiff'),
+        (b'ID3', 'mp3'),
+        (b'fLaC', 'flac'),
+        (b'OggS', 'ogg'),
+        (b'\x1AE\xDF\xA3', 'matroska'),
+    )
+    RIFF_MAGICS = {b'RIFF', b'RF64', b'BW64'}
+    RIFF_FORMATS = {b'WAVE': 'wav', b'WEBP': 'webp', b'AVI ': 'avi'}
+    # Leading QuickTime atoms of .mov files written without an ftyp atom
+    QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+    # Also a valid MPEG-1 Layer I frame header, but far more often UTF-16 text
+    UTF16_LE_BOM = b'\xFF\xFE'
+    FTYP_AUDIO_BRANDS = {b'M4A ', b'M4B ', b'M4P '}
+    FTYP_IMAGE_BRANDS = {b'heic', b'heix', b'mif1', b'msf1'}
+    FORMAT_FAMILIES = {
+        'jpeg': 'image', 'png': 'image', 'tiff': 'image', 'webp': 'image', 'heic': 'image',
+        'mp3': 'audio', 'flac': 'audio', 'ogg': 'audio', 'wav': 'audio', 'm4a': 'audio',
+        'mp4': 'video', 'matroska': 'video', 'avi': 'video',
+    }
+    
+    # mutagen stream info attributes reported as technical audio metadata
+    AUDIO_INFO_FIELDS = (
+        'length', 'bitrate', 'sample_rate', 'channels', 'bits_per_sample',
+        'codec', 'codec_description', 'bitrate_mode', 'encoder_info',
+    )
+    
+    # Files larger than this only have their leading PROBE_BYTES parsed by hachoir
+    MAX_FULL_PARSE_BYTES = 2 * 1024 ** 3
+    PROBE_BYTES = 8 * 1024 * 1024
+    # hachoir derives these from the stream size, so a bounded parse gets them wrong
+    SIZE_DEPENDENT_FIELDS = frozenset({'Duration', 'Bit rate', 'Compression rate'})
+    
+    # Images larger than this are memory-mapped before parsing
+    MMAP_MIN_SIZE = 4096
+    
+    # exifread bookkeeping entries that are not real tags
+    EXCLUDED_IMAGE_TAGS = frozenset({'JPEGThumbnail', 'TIFFThumbnail', 'Filename'})
+    # exifread tag name -> highest tag number using it; GPS tags resolve to their GPSInfo pointer
+    EXIF_TAG_NUMBERS = {entry[0]: number for number, entry in sorted(EXIF_TAGS.items())}
+    EXIF_TAG_NUMBERS.update(dict.fromkeys(
+        (entry[0] for entry in EXIF_TAGS[0x8825][1][1].values()), 0x8825
+    ))
+    
+    @classmethod
+    def detect_format(cls, header: bytes) -> Optional[str]:
+        """
+        Identify the true file format from its leading bytes.
+        
+        Args:
+            header: First bytes of the file
+            
+        Returns:
+            Format name, or None if the signature is not recognized
+        """
+        for signature, file_format in cls.MAGIC_SIGNATURES:
+            if header.startswith(signature):
+                return file_format
+        
+        # MPEG audio frame header: 11 sync bits followed by a valid version, layer,
+        # bitrate and sample rate (covers MPEG-1/2/2.5, with or without CRC)
+        if (
+            len(header) >= 3
+            and header[0] == 0xFF
+            and header[1] & 0xE0 == 0xE0
+            and header[1] & 0x18 != 0x08  # reserved version
+            and header[1] & 0x06 != 0x00  # reserved layer
+            and header[2] & 0xF0 != 0xF0  # invalid bitrate index
+            and header[2] & 0x0C != 0x0C  # reserved sample rate
+            and not header.startswith(cls.UTF16_LE_BOM)
+        ):
+            return 'mp3'
+        
+        # Container formats carry their sub-type further in
+        if header[:4] in cls.RIFF_MAGICS:
+            return cls.RIFF_FORMATS.get(header[8:12])
+        
+        if header[4:8] in cls.QUICKTIME_ATOMS:
+            return 'mp4'
+        
+        if header[4:8] == b'ftyp':
+            brand = header[8:12]
+            if brand in cls.FTYP_AUDIO_BRANDS:
+                return 'm4a'
+            if brand in cls.FTYP_IMAGE_BRANDS:
+                return 'heic'
+            return 'mp4'
+        
+        return None
+    
+    @classmethod
+    def _stop_tag_for(cls, wanted: Set[str]) -> str:
+        """
+        Pick the exifread stop tag that still covers every wanted tag.
+        
+        IFD entries are stored in tag-number order, so the scan can end at
+        the highest-numbered wanted tag.
+        
+        Args:
+            wanted: exifread tag names without their IFD prefix
+            
+        Returns:
+            Tag name to pass as stop_tag
+        """
+        numbers = [cls.EXIF_TAG_NUMBERS.get(name) for name in wanted]
+        if not numbers or None in numbers:
+            # Unknown tag names cannot be ordered, scan everything
+            return DEFAULT_STOP_TAG
+        return EXIF_TAGS[max(numbers)][0]
+    
+    @staticmethod
+    def _fast_jpeg_exif(file: BinaryIO, stop_tag: str = DEFAULT_STOP_TAG) -> Optional[Dict[str, Any]]:
+        """
+        Read EXIF tags by seeking straight to the JPEG APP1 segment.
+        
+        Args:
+            file: Open binary handle positioned anywhere in a JPEG file
+            stop_tag: exifread tag name at which to stop decoding each IFD
+            
+        Returns:
+            Dictionary of exifread tags, or None if the markers could not be parsed
+        """
+        file.seek(0)
+        if file.read(2) != b'\xFF\xD8':
+            return None
+        
+        while True:
+            marker = file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            
+            # Start of scan / end of image: no EXIF block before the image data
+            if marker[1] in (0xDA, 0xD9):
+                return {}
+            
+            length_bytes = file.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = int.from_bytes(length_bytes, 'big')
+            
+            if marker[1] == 0xE1:
+                payload = file.read(length - 2)
+                if payload.startswith(b'Exif\x00\x00'):
+                    return exifread.process_file(
+                        io.BytesIO(payload[6:]), details=False, stop_tag=stop_tag
+                    )
+            else:
+                file.seek(length - 2, os.SEEK_CUR)
     
     @staticmethod
-    def get_image_metadata(file_path: Path) -> Dict[str, Any]:
+    def _fast_png_metadata(file: BinaryIO, stop_tag: str = DEFAULT_STOP_TAG) -> Optional[Dict[str, Any]]:
+        """
+        Read EXIF and text metadata by walking PNG chunks, skipping image data.
+        
+        Args:
+            file: Open binary handle positioned anywhere in a PNG file
+            stop_tag: exifread tag name at which to stop decoding each IFD
+            
+        Returns:
+            Dictionary of tags, or None if the chunks could not be parsed
+        """
+        file.seek(0)
+        if file.read(8) != b'\x89PNG\r\n\x1a\n':
+            return None
+        
+        tags = {}
+        while True:
+            chunk_header = file.read(8)
+            if len(chunk_header) < 8:
+                return None
+            length = int.from_bytes(chunk_header[:4], 'big')
+            chunk_type = chunk_header[4:]
+            
+            if chunk_type == b'IEND':
+                return tags
+            
+            if chunk_type not in (b'eXIf', b'tEXt', b'iTXt'):
+                file.seek(length + 4, os.SEEK_CUR)
+                continue
+            
+            data = file.read(length)
+            file.seek(4, os.SEEK_CUR)  # CRC
+            
+            if chunk_type == b'eXIf':
+                tags.update(exifread.process_file(io.BytesIO(data), details=False, stop_tag=stop_tag))
+            elif chunk_type == b'tEXt':
+                keyword, _, text = data.partition(b'\x00')
+                tags[f"PNG {keyword.decode('latin-1')}"] = text.decode('latin-1')
+            else:
+                # iTXt: keyword, compression flag/method, language, translated keyword, text
+                keyword, _, rest = data.partition(b'\x00')
+                compressed = rest[:1] == b'\x01'
+                _, _, rest = rest[2:].partition(b'\x00')
+                _, _, text = rest.partition(b'\x00')
+                if compressed:
+                    text = zlib.decompress(text)
+                tags[f"PNG {keyword.decode('latin-1')}"] = text.decode('utf-8', errors='replace')
+    
+    @classmethod
+    def get_image_metadata(
+        cls,
+        file_path: Path,
+        file: Optional[BinaryIO] = None,
+        file_format: Optional[str] = None,
+        wanted: Optional[Set[str]] = None,
+    ) -> Dict[str, Any]:
         """
         Extract metadata from image files using exifread.
         
         Args:
             file_path: Path to the image file
+            file: Already-open binary handle to reuse instead of reopening the file
+            file_format: Format detected from the file signature, if known
+            wanted: exifread tag names without their IFD prefix (e.g. 'Orientation',
+                'DateTimeOriginal', 'GPSLatitude') to restrict decoding to
             
         Returns:
             Dictionary containing image metadata
         """
         metadata = {}
+        stop_tag = cls._stop_tag_for(wanted) if wanted else DEFAULT_STOP_TAG
         try:
-            with open(file_path, 'rb') as file:
-                tags = exifread.process_file(file, details=False)
-                for tag, value in tags.items():
-                    if tag not in ['JPEGThumbnail', 'TIFFThumbnail', 'Filename', 'JPEGThumbnail']:
-                        metadata[f"IMG_{tag}"] = str(value)
+            if file is None:
+                with open(file_path, 'rb') as file:
+                    tags = cls._read_image_tags(file, file_format, stop_tag)
+            else:
+                tags = cls._read_image_tags(file, file_format, stop_tag)
+            
+            for tag, value in tags.items():
+                if tag in cls.EXCLUDED_IMAGE_TAGS:
+                    continue
+                if wanted and tag.split(' ', 1)[-1] not in wanted:
+                    continue
+                metadata[f"IMG_{tag}"] = str(value)
         except Exception as e:
-            logging.debug(f"Could not extract image metadata from {file_path}: {e}")
+            logging.debug("Could not extract image metadata from %s: %s", file_path, e)
         
         return metadata
     
-    @staticmethod
-    def get_audio_metadata(file_path: Path) -> Dict[str, Any]:
+    @classmethod
+    def _read_image_tags(
+        cls,
+        file: BinaryIO,
+        file_format: Optional[str],
+        stop_tag: str = DEFAULT_STOP_TAG,
+    ) -> Dict[str, Any]:
+        """
+        Read image tags, memory-mapping the file when it is large enough to benefit.
+        
+        Args:
+            file: Open binary handle to the image file
+            file_format: Format detected from the file signature, if known
+            stop_tag: exifread tag name at which to stop decoding each IFD
+            
+        Returns:
+            Dictionary of tags
+        """
+        mapped = cls._map_file(file)
+        if mapped is None:
+            return cls._scan_image_tags(file, file_format, stop_tag)
+        
+        with mapped:
+            return cls._scan_image_tags(mapped, file_format, stop_tag)
+    
+    @classmethod
+    def _map_file(cls, file: BinaryIO) -> Optional[mmap.mmap]:
         """
-        Extract metadata from audio files using mutagen.
+        Memory-map an open file read-only.
+        
+        Args:
+            file: Open binary handle
+            
+        Returns:
+            The mapping, or None for small or non-mappable files
+        """
+        try:
+            fileno = file.fileno()
+            if os.fstat(fileno).st_size <= cls.MMAP_MIN_SIZE:
+                return None
+            return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, io.UnsupportedOperation) as e:
+            logging.debug("Could not memory-map file, reading it directly: %s", e)
+            return None
+    
+    @classmethod
+    def _scan_image_tags(
+        cls,
+        file: BinaryIO,
+        file_format: Optional[str],
+        stop_tag: str = DEFAULT_STOP_TAG,
+    ) -> Dict[str, Any]:
+        """
+        Read image tags, using a container-specific fast path when available.
+        
+        Args:
+            file: Open binary handle to the image file
+            file_format: Format detected from the file signature, if known
+            stop_tag: exifread tag name at which to stop decoding each IFD
+            
+        Returns:
+            Dictionary of tags
+        """
+        if file_format is None:
+            file.seek(0)
+            file_format = cls.detect_format(file.read(cls.HEADER_SIZE))
+        
+        tags = None
+        try:
+            if file_format == 'jpeg':
+                tags = cls._fast_jpeg_exif(file, stop_tag)
+            elif file_format == 'png':
+                tags = cls._fast_png_metadata(file, stop_tag)
+        except Exception as e:
+            logging.debug("Fast %s metadata path failed: %s", file_format, e)
+        
+        # Fall back to the generic exifread scan
+        if tags is None:
+            file.seek(0)
+            tags = exifread.process_file(file, details=False, stop_tag=stop_tag)
+        
+        return tags
+    
+    @classmethod
+    def get_audio_metadata(cls, file_path: Path, size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Extract metadata from audio files using mutagen, falling back to
+        hachoir for files mutagen does not recognize.
         
         Args:
             file_path: Path to the audio file
+            size: File size in bytes, if already known
             
         Returns:
             Dictionary containing audio metadata
@@ -102,40 +487,77 @@ class UniversalMetadataExtractor:
         metadata = {}
         try:
             audio = mutagen.File(file_path)
-            if audio:
-                # Technical metadata
-                if hasattr(audio, 'info'):
-                    for attr in dir(audio.info):
-                        if not attr.startswith('_') and not callable(getattr(audio.info, attr)):
-                            value = getattr(audio.info, attr)
-                            if value is not None:
-                                metadata[f"AUDIO_TECH_{attr}"] = str(value)
-                
-                # Tag metadata (ID3, Vorbis comments, etc.)
-                if audio.tags:
-                    for tag in audio.tags:
-                        value = audio.tags[tag]
-                        if value:
-                            metadata[f"AUDIO_TAG_{tag}"] = str(value[0] if isinstance(value, list) else value)
+            if audio is None:
+                return cls._hachoir_metadata(file_path, size, "AUDIO_")
+            
+            # Technical metadata
+            info = getattr(audio, 'info', None)
+            if info is not None:
+                for attr in cls.AUDIO_INFO_FIELDS:
+                    value = getattr(info, attr, None)
+                    if value is not None:
+                        metadata[f"AUDIO_TECH_{attr}"] = str(value)
+            
+            # Tag metadata (ID3, Vorbis comments, etc.)
+            if audio.tags:
+                for tag, value in audio.tags.items():
+                    if value:
+                        metadata[f"AUDIO_TAG_{tag}"] = str(value[0] if isinstance(value, list) else value)
         except Exception as e:
-            logging.debug(f"Could not extract audio metadata from {file_path}: {e}")
+            logging.debug("Could not extract audio metadata from %s: %s", file_path, e)
         
         return metadata
     
-    @staticmethod
-    def get_video_metadata(file_path: Path) -> Dict[str, Any]:
+    @classmethod
+    def get_video_metadata(cls, file_path: Path, size: Optional[int] = None) -> Dict[str, Any]:
         """
         Extract metadata from video files using hachoir.
         
         Args:
             file_path: Path to the video file
+            size: File size in bytes, if already known
             
         Returns:
             Dictionary containing video metadata
         """
+        return cls._hachoir_metadata(file_path, size, "VIDEO_")
+    
+    @classmethod
+    def _hachoir_metadata(cls, file_path: Path, size: Optional[int], prefix: str) -> Dict[str, Any]:
+        """
+        Extract metadata using hachoir, bounding the parse on oversized files.
+        Fields hachoir derives from the stream size are dropped from bounded parses.
+        
+        Args:
+            file_path: Path to the file
+            size: File size in bytes, if already known
+            prefix: Prefix for the metadata keys
+            
+        Returns:
+            Dictionary containing extracted metadata
+        """
         metadata = {}
+        bounded = size is not None and size > cls.MAX_FULL_PARSE_BYTES
         try:
-            parser = createParser(str(file_path))
+            if bounded:
+                # Container metadata lives in the header region, parse only that
+                file = open(file_path, 'rb')
+                parser = None
+                try:
+                    stream = InputIOStream(
+                        file,
+                        size=cls.PROBE_BYTES * 8,
+                        source=f"file:{file_path}",
+                        tags=[("filename", str(file_path))],
+                    )
+                    parser = guessParser(stream)
+                finally:
+                    # The parser owns the file once created, otherwise close it here
+                    if parser is None:
+                        file.close()
+            else:
+                parser = createParser(str(file_path))
+            
             if parser:
                 with parser:
                     extracted = extractMetadata(parser)
@@ -143,170 +565,585 @@ class UniversalMetadataExtractor:
                         for line in extracted.exportPlaintext():
                             if ":" in line:
                                 key, value = line.split(":", 1)
-                                metadata[f"VIDEO_{key.strip()}"] = value.strip()
+                                key = key.strip()
+                                if bounded and key.lstrip('- ') in cls.SIZE_DEPENDENT_FIELDS:
+                                    continue
+                                metadata[f"{prefix}{key}"] = value.strip()
         except Exception as e:
-            logging.debug(f"Could not extract video metadata from {file_path}: {e}")
+            logging.debug("Could not extract metadata from %s with hachoir: %s", file_path, e)
         
         return metadata
     
     @classmethod
-    def get_all_metadata(cls, file_path: Path) -> Dict[str, Any]:
+    def get_content_metadata(cls, file_path: Path, size: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
-        Main method to extract metadata based on file extension.
+        Extract format-specific metadata based on the file signature,
+        falling back to the file extension for unrecognized signatures.
+        An audio extension wins over a generic MP4 container signature.
         
         Args:
             file_path: Path to the file
+            size: File size in bytes, if already known
             
         Returns:
-            Dictionary containing all extracted metadata
+            Dictionary containing the extracted metadata, or None if the file
+            could not be read
         """
-        all_metadata = {}
+        metadata = {}
         extension = file_path.suffix.lower()
         
-        # Image files
-        if extension in cls.IMAGE_EXTENSIONS:
-            all_metadata.update(cls.get_image_metadata(file_path))
+        try:
+            with open(file_path, 'rb') as file:
+                file_format = cls.detect_format(file.read(cls.HEADER_SIZE))
+                family = cls.EXTENSION_FAMILIES.get(extension)
+                
+                # Only a recognized signature overrides the extension
+                if file_format is not None:
+                    # Generic ftyp brands (isom, mp42, ...) also carry audio-only files
+                    if not (file_format == 'mp4' and family == 'audio'):
+                        family = cls.FORMAT_FAMILIES[file_format]
+                
+                # Image files
+                if family == 'image':
+                    metadata.update(cls.get_image_metadata(file_path, file, file_format))
+                
+                # Audio files
+                elif family == 'audio':
+                    metadata.update(cls.get_audio_metadata(file_path, size))
+                
+                # Video files
+                elif family == 'video':
+                    metadata.update(cls.get_video_metadata(file_path, size))
+        except OSError as e:
+            logging.debug("Could not read %s: %s", file_path, e)
+            return None
+        
+        return metadata
+    
+    @staticmethod
+    def get_file_metadata(file_path: Path, stat_info: Optional[os.stat_result]) -> Dict[str, Any]:
+        """
+        Build the basic file system metadata included for every file.
         
-        # Audio files
-        elif extension in cls.AUDIO_EXTENSIONS:
-            all_metadata.update(cls.get_audio_metadata(file_path))
+        Args:
+            file_path: Path to the file
+            stat_info: Stat result of the file, or None if it could not be taken
+            
+        Returns:
+            Dictionary containing size, timestamps and extension
+        """
+        if stat_info is None:
+            return {}
         
-        # Video files
-        elif extension in cls.VIDEO_EXTENSIONS:
-            all_metadata.update(cls.get_video_metadata(file_path))
+        return {
+            "FILE_SIZE": f"{stat_info.st_size} bytes",
+            "CREATED": str(stat_info.st_ctime),
+            "MODIFIED": str(stat_info.st_mtime),
+            "FILE_EXTENSION": file_path.suffix.lower(),
+        }
+    
+    @classmethod
+    def get_all_metadata(cls, file_path: Path, stat_info: Optional[os.stat_result] = None) -> Dict[str, Any]:
+        """
+        Main method to extract all metadata: format-specific metadata plus
+        the basic file metadata.
         
-        # Basic file metadata (always included)
-        try:
-            stat_info = file_path.stat()
-            all_metadata.update({
-                "FILE_SIZE": f"{stat_info.st_size} bytes",
-                "CREATED": str(stat_info.st_ctime),
-                "MODIFIED": str(stat_info.st_mtime),
-                "FILE_EXTENSION": extension,
-            })
-        except Exception:
-            pass
+        Args:
+            file_path: Path to the file
+            stat_info: Stat result already taken for the file, to avoid another stat call
+            
+        Returns:
+            Dictionary containing all extracted metadata
+        """
+        if stat_info is None:
+            try:
+                stat_info = file_path.stat()
+            except OSError:
+                pass
         
+        size = stat_info.st_size if stat_info is not None else None
+        all_metadata = cls.get_content_metadata(file_path, size) or {}
+        all_metadata.update(cls.get_file_metadata(file_path, stat_info))
         return all_metadata
 
 
+# ============================================================================
+# METADATA CACHE
+# ============================================================================
+
+CACHE_FILE = '.metadata_cache.sqlite'
+CACHE_VERSION = 1  # Bump whenever extractor output changes, to invalidate old entries
+CACHE_BATCH_SIZE = 1000  # Queued entries are written once this many accumulate
+
+
+class MetadataCache:
+    """
+    Persistent cache of extracted content metadata, keyed by file path.
+    Entries are only reused while the file's size and modification time match
+    and they were written by the current CACHE_VERSION.
+    """
+    
+    def __init__(self, db_path: str = CACHE_FILE):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            db_path: Location of the SQLite cache file
+        """
+        self.connection = sqlite3.connect(db_path)
+        try:
+            self._create_schema()
+        except sqlite3.DatabaseError as e:
+            # The cache is disposable: start over rather than fail the scan
+            logging.debug("Discarding unreadable metadata cache %s: %s", db_path, e)
+            self.connection.close()
+            os.remove(db_path)
+            self.connection = sqlite3.connect(db_path)
+            self._create_schema()
+        self._pending: List[Tuple[str, int, int, int, Union[str, bytes]]] = []
+    
+    def _create_schema(self) -> None:
+        """Create the metadata table, dropping one in an outdated layout."""
+        # Caches from before entries were versioned cannot be trusted
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(metadata)")}
+        if columns and 'version' not in columns:
+            self.connection.execute("DROP TABLE metadata")
+        
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "path TEXT PRIMARY KEY, version INTEGER, size INTEGER, mtime_ns INTEGER, blob BLOB)"
+        )
+    
+    def get(self, file_path: Path, stat_info: os.stat_result) -> Optional[Dict[str, Any]]:
+        """
+        Look up cached metadata for an unchanged file.
+        
+        Args:
+            file_path: Path to the file
+            stat_info: Current stat result of the file
+            
+        Returns:
+            Cached metadata, or None if missing, stale or from another version
+        """
+        row = self.connection.execute(
+            "SELECT version, size, mtime_ns, blob FROM metadata WHERE path = ?",
+            (str(file_path),)
+        ).fetchone()
+        if (
+            row
+            and row[0] == CACHE_VERSION
+            and row[1] == stat_info.st_size
+            and row[2] == stat_info.st_mtime_ns
+        ):
+            return orjson.loads(row[3]) if orjson is not None else json.loads(row[3])
+        return None
+    
+    def put(self, file_path: Path, stat_info: os.stat_result, metadata: Dict[str, Any]) -> None:
+        """
+        Queue metadata for storage; written in batches and on flush().
+        
+        Args:
+            file_path: Path to the file
+            stat_info: Stat result the metadata was extracted under
+            metadata: Extracted content metadata, without file system fields
+        """
+        if orjson is not None:
+            blob = orjson.dumps(metadata, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            blob = json.dumps(metadata)
+        self._pending.append(
+            (str(file_path), CACHE_VERSION, stat_info.st_size, stat_info.st_mtime_ns, blob)
+        )
+        if len(self._pending) >= CACHE_BATCH_SIZE:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write all queued entries in a single transaction."""
+        if self._pending:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)",
+                    self._pending
+                )
+            self._pending.clear()
+    
+    def close(self) -> None:
+        """Flush queued entries and close the database."""
+        self.flush()
+        self.connection.close()
+
+
 # ============================================================================
 # FILE MANAGER
 # ============================================================================
 
+def _extract_metadata(job: Tuple[Path, Optional[os.stat_result]]) -> Optional[Dict[str, Any]]:
+    """
+    Extract format-specific metadata for a (path, stat result) pair.
+    File system fields are added by the caller.
+    
+    Args:
+        job: File path and its stat result from the walker
+        
+    Returns:
+        Dictionary containing the extracted content metadata, or None if the
+        file could not be read
+    """
+    file_path, stat_info = job
+    size = stat_info.st_size if stat_info is not None else None
+    return UniversalMetadataExtractor.get_content_metadata(file_path, size)
+
+
+def _extract_batch(jobs: List[Tuple[Path, Optional[os.stat_result]]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Executor entry point: extract several files per task, so the cost of
+    handing work to another process is shared across the batch.
+    
+    Args:
+        jobs: File paths and their stat results from the walker
+        
+    Returns:
+        Extracted content metadata for each job, in order
+    """
+    return [_extract_metadata(job) for job in jobs]
+
+
+class ReportDirectory(NamedTuple):
+    """Directory header in the metadata report."""
+    relative: str  # Path relative to the scanned folder
+
+
+class ReportFile(NamedTuple):
+    """File entry in the metadata report, in walk order."""
+    name: str
+    report_path: str  # Path relative to the scanned folder
+    path: Path
+    stat_info: Optional[os.stat_result]
+    cached: Optional[Dict[str, Any]]  # Cached content metadata, None if it must be extracted
+
+
 class FileManager:
     """
     Manages recursive file system traversal and metadata extraction.
     Handles directory exploration and generates comprehensive reports.
     """
     
-    def __init__(self, base_folder: str):
+    # Parallel extraction tuning
+    PARALLEL_THRESHOLD = 32  # Below this many files, use threads instead of processes
+    BATCH_SIZE = 16  # Report items handed to the executor per task
+    MAX_PENDING = 256  # Report items submitted or awaiting their turn at any time
+    
+    def __init__(
+        self,
+        base_folder: str,
+        cache: Optional[MetadataCache] = None,
+        sort_files: bool = False,
+    ):
         """
         Initialize FileManager with target directory.
         
         Args:
             base_folder: Root directory to scan
+            cache: Metadata cache to reuse results for unchanged files
+            sort_files: Report files in name order within each directory,
+                instead of the order the file system lists them
         """
         self.base_folder = Path(base_folder).resolve()
+        self.cache = cache
+        self.sort_files = sort_files
         self.ignored_dirs = {'.git', '__pycache__', '.venv', 'node_modules'}
         self.ignored_files = {'.DS_Store', 'Thumbs.db', 'desktop.ini'}
+        self._ignored = frozenset(self.ignored_dirs | self.ignored_files)
+        self._gitignore = self._load_gitignore()
+        self._base_prefix_len = len(os.path.join(str(self.base_folder), ''))
+        self._self_name = Path(__file__).name
+        self._skip_suffixes = ('.log',)
     
-    def should_skip(self, path: Path) -> bool:
+    def _skip_name(self, name: str) -> bool:
         """
         Determine if a file or directory should be skipped.
         
+        Hidden ancestors need no check here, the walker never descends into them.
+        
         Args:
-            path: Path to check
+            name: File or directory name to check
             
         Returns:
             True if should be skipped, False otherwise
         """
-        # Skip hidden files and directories
-        if any(part.startswith('.') for part in path.parts):
-            return True
+        return name.startswith('.') or name in self._ignored
+    
+    def _load_gitignore(self) -> Optional["pathspec.PathSpec"]:
+        """
+        Compile the base folder's .gitignore once, if pathspec is installed.
+        
+        Returns:
+            Compiled patterns, or None if unavailable
+        """
+        if pathspec is None:
+            return None
         
-        # Skip ignored directories
-        if path.is_dir() and path.name in self.ignored_dirs:
-            return True
+        # Like git, tolerate non-UTF-8 bytes; a pattern pathspec rejects
+        # (a ValueError) only disables .gitignore support, never the scan
+        try:
+            with open(self.base_folder / '.gitignore', encoding='utf-8', errors='replace') as file:
+                return pathspec.PathSpec.from_lines('gitwildmatch', file)
+        except (OSError, ValueError) as e:
+            logging.debug("Could not load .gitignore from %s: %s", self.base_folder, e)
+            return None
+    
+    def _gitignored(self, entry: os.DirEntry, is_dir: bool = False) -> bool:
+        """
+        Determine if an entry matches the base folder's .gitignore patterns.
         
-        # Skip ignored files
-        if path.is_file() and path.name in self.ignored_files:
-            return True
+        Args:
+            entry: Directory entry to check
+            is_dir: Whether the entry is a directory
+            
+        Returns:
+            True if ignored by .gitignore, False otherwise
+        """
+        if self._gitignore is None:
+            return False
         
-        return False
+        relative = entry.path[self._base_prefix_len:]
+        return self._gitignore.match_file(relative + '/' if is_dir else relative)
     
-    def run(self, process_logger: logging.Logger, metadata_logger: logging.Logger) -> None:
+    def _iter_tree(self, root: Path) -> Iterator[Tuple[Path, Iterator[os.DirEntry]]]:
         """
-        Main execution method - recursively scans directory and extracts metadata.
+        Walk the tree top-down with os.scandir, reusing its cached entry types.
+        
+        Ignore rules are applied once when a directory is pushed, so nothing
+        below a skipped directory is ever listed or checked again.
         
         Args:
-            process_logger: Logger for process information
-            metadata_logger: Logger for metadata output
+            root: Directory to start from
+            
+        Yields:
+            (directory path, its file entries as scandir lists them); each
+            entry iterator must be exhausted before the walk moves on
         """
-        process_logger.info(f"Starting deep exploration of: {self.base_folder}")
-        process_logger.info(f"Metadata report will be saved to: metadata_report.log")
+        stack = [root]
+        while stack:
+            current_path = stack.pop()
+            try:
+                scan = os.scandir(current_path)
+            except OSError:
+                continue
+            
+            subdirs = []
+            with scan:
+                yield current_path, self._iter_files(scan, subdirs)
+            
+            # Reversed so subdirectories are visited in listing order
+            stack.extend(reversed(subdirs))
+    
+    def _iter_files(self, scan: Iterator[os.DirEntry], subdirs: List[Path]) -> Iterator[os.DirEntry]:
+        """
+        Yield the file entries of a directory listing as they are read,
+        collecting the subdirectories to descend into.
         
-        file_count = 0
-        supported_files = 0
+        Args:
+            scan: Open os.scandir iterator
+            subdirs: Receives the subdirectories that are not skipped
+            
+        Yields:
+            File entries, in listing order
+        """
+        try:
+            for entry in scan:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                
+                if not is_dir:
+                    yield entry
+                # Like os.walk, list symlinked directories but don't descend into them
+                elif (
+                    not entry.is_symlink()
+                    and not self._skip_name(entry.name)
+                    and not self._gitignored(entry, is_dir=True)
+                ):
+                    subdirs.append(Path(entry.path))
+        except OSError:
+            # Directory became unreadable mid-listing, keep what was read
+            return
+    
+    @staticmethod
+    def _submit_batch(
+        executor: Union[ThreadPoolExecutor, ProcessPoolExecutor],
+        batch: List[Union[ReportDirectory, ReportFile]],
+    ) -> Tuple[List[Union[ReportDirectory, ReportFile]], Optional[Future]]:
+        """
+        Submit the files of a batch that are not cached as a single task.
         
-        # Recursive directory walk
-        for root, dirs, files in os.walk(self.base_folder, topdown=True):
-            current_path = Path(root)
+        Args:
+            executor: Executor running the extractions
+            batch: Consecutive report items
             
-            # Filter out ignored directories
-            dirs[:] = [d for d in dirs if not self.should_skip(current_path / d)]
+        Returns:
+            (the batch, future of its extraction results or None if nothing to extract)
+        """
+        jobs = [
+            (item.path, item.stat_info)
+            for item in batch
+            if isinstance(item, ReportFile) and item.cached is None
+        ]
+        return batch, executor.submit(_extract_batch, jobs) if jobs else None
+    
+    def _write_batch(
+        self,
+        batch: List[Union[ReportDirectory, ReportFile]],
+        future: Optional[Future],
+        reporter: Reporter,
+    ) -> int:
+        """
+        Write a batch of report items, waiting for its extraction if still running.
+        
+        Args:
+            batch: Consecutive report items
+            future: Pending extraction results for the batch, or None
+            reporter: Writer for the metadata report
             
-            # Skip this directory if it should be ignored
-            if self.should_skip(current_path):
+        Returns:
+            Number of files written with metadata
+        """
+        results = iter(future.result() if future is not None else ())
+        supported = 0
+        
+        for item in batch:
+            if isinstance(item, ReportDirectory):
+                reporter.write_dir_header(item.relative)
                 continue
             
-            relative_path = current_path.relative_to(self.base_folder)
+            metadata = item.cached
+            if metadata is None:
+                metadata = next(results)
+                if metadata is None:
+                    # Unreadable this time, retry on the next run instead of caching
+                    metadata = {}
+                elif self.cache is not None and item.stat_info is not None:
+                    self.cache.put(item.path, item.stat_info, metadata)
             
-            # Log directory header
-            if str(relative_path) != '.':
-                metadata_logger.info(f"\n{'='*80}")
-                metadata_logger.info(f"DIRECTORY: {relative_path}")
-                metadata_logger.info(f"{'='*80}")
+            # File system fields always reflect the current stat, never the cache
+            metadata = {
+                **metadata,
+                **UniversalMetadataExtractor.get_file_metadata(item.path, item.stat_info),
+            }
             
-            # Process files in current directory
-            for filename in sorted(files):
-                file_path = current_path / filename
-                file_count += 1
+            reporter.write_file(item.name, item.report_path, metadata)
+            supported += bool(metadata)
+        
+        return supported
+    
+    def run(self, process_logger: logging.Logger, reporter: Reporter) -> None:
+        """
+        Main execution method - recursively scans directory and extracts metadata.
+        
+        Args:
+            process_logger: Logger for process information
+            reporter: Writer for the metadata report
+        """
+        process_logger.info("Starting deep exploration of: %s", self.base_folder)
+        process_logger.info("Metadata report will be saved to: %s", reporter.path)
+        
+        file_count = 0
+        supported_files = 0
+        
+        def report_items() -> Iterator[Union[ReportDirectory, ReportFile]]:
+            """Walk the tree, yielding directory headers and file entries in report order."""
+            nonlocal file_count
+            
+            for current_path, files in self._iter_tree(self.base_folder):
+                relative_str = str(current_path.relative_to(self.base_folder))
+                if relative_str != '.':
+                    yield ReportDirectory(relative_str)
+                    path_prefix = relative_str + os.sep
+                else:
+                    path_prefix = ''
                 
-                # Skip ignored files
-                if self.should_skip(file_path):
-                    continue
+                if self.sort_files:
+                    files = sorted(files, key=lambda entry: entry.name)
                 
-                # Skip the script itself and log files
-                if filename == Path(__file__).name or filename.endswith('.log'):
+                for entry in files:
+                    filename = entry.name
+                    file_count += 1
+                    
+                    # Skip ignored files
+                    if self._skip_name(filename) or self._gitignored(entry):
+                        continue
+                    
+                    # Skip the script itself and log files
+                    if filename == self._self_name or filename.endswith(self._skip_suffixes):
+                        continue
+                    
+                    file_path = Path(entry.path)
+                    
+                    # Reuse the walker's stat for the cache check and FILE_SIZE/CREATED/MODIFIED
+                    try:
+                        stat_info = entry.stat()
+                    except OSError:
+                        stat_info = None
+                    
+                    cached = None
+                    if self.cache is not None and stat_info is not None:
+                        cached = self.cache.get(file_path, stat_info)
+                    
+                    yield ReportFile(filename, f"{path_prefix}{filename}", file_path, stat_info, cached)
+        
+        # Peek ahead to pick the executor: processes pay off for large trees
+        # on multi-core machines, threads avoid process start-up otherwise
+        items = report_items()
+        head = []
+        to_extract = 0
+        for item in items:
+            head.append(item)
+            if isinstance(item, ReportFile) and item.cached is None:
+                to_extract += 1
+                if to_extract >= self.PARALLEL_THRESHOLD:
+                    break
+        
+        cpu_count = os.cpu_count() or 1
+        if to_extract >= self.PARALLEL_THRESHOLD and cpu_count > 1:
+            executor = ProcessPoolExecutor(max_workers=cpu_count)
+        else:
+            executor = ThreadPoolExecutor(max_workers=cpu_count)
+        
+        with executor:
+            # Batches in walk order, each with the future of its extractions (if any)
+            pending: deque = deque()
+            max_batches = max(1, self.MAX_PENDING // self.BATCH_SIZE)
+            batch = []
+            
+            for item in itertools.chain(head, items):
+                batch.append(item)
+                if len(batch) < self.BATCH_SIZE:
                     continue
+                pending.append(self._submit_batch(executor, batch))
+                batch = []
                 
-                # Extract metadata
-                metadata = UniversalMetadataExtractor.get_all_metadata(file_path)
-                
-                # Log file information
-                metadata_logger.info(f"\nFILE: {filename}")
-                metadata_logger.info(f"PATH: {relative_path / filename}")
-                
-                if metadata:
-                    supported_files += 1
-                    metadata_logger.info("METADATA:")
-                    for key in sorted(metadata.keys()):
-                        value = str(metadata[key])
-                        # Truncate very long values
-                        if len(value) > 500:
-                            value = value[:497] + "..."
-                        metadata_logger.info(f"  • {key}: {value}")
-                else:
-                    metadata_logger.info("  • No extractable metadata found")
+                # Write finished batches as soon as they reach the front, and block on
+                # the oldest once the window is full so memory stays bounded
+                while pending and (
+                    len(pending) >= max_batches
+                    or pending[0][1] is None
+                    or pending[0][1].done()
+                ):
+                    supported_files += self._write_batch(*pending.popleft(), reporter)
+            
+            if batch:
+                pending.append(self._submit_batch(executor, batch))
+            while pending:
+                supported_files += self._write_batch(*pending.popleft(), reporter)
         
         # Summary
-        process_logger.info(f"\n{'='*60}")
+        process_logger.info("\n%s", '='*60)
         process_logger.info("SCAN COMPLETE")
-        process_logger.info(f"{'='*60}")
-        process_logger.info(f"Total files scanned: {file_count}")
-        process_logger.info(f"Files with metadata extracted: {supported_files}")
-        process_logger.info(f"Metadata report saved to: metadata_report.log")
+        process_logger.info('='*60)
+        process_logger.info("Total files scanned: %d", file_count)
+        process_logger.info("Files with metadata extracted: %d", supported_files)
+        process_logger.info("Metadata report saved to: %s", reporter.path)
 
 
 # ============================================================================
@@ -315,8 +1152,9 @@ class FileManager:
 
 def main():
     """Main entry point for the script."""
-    # Setup logging
-    process_logger, metadata_logger = setup_logging()
+    # Setup logging and the metadata report
+    process_logger = setup_logging()
+    reporter = Reporter()
     
     # Get target directory from command line or use current directory
     if len(sys.argv) > 1:
@@ -328,16 +1166,27 @@ def main():
         # Validate directory
         target_path = Path(target_dir)
         if not target_path.exists():
-            process_logger.error(f"Directory does not exist: {target_dir}")
+            process_logger.error("Directory does not exist: %s", target_dir)
             sys.exit(1)
         
         if not target_path.is_dir():
-            process_logger.error(f"Path is not a directory: {target_dir}")
+            process_logger.error("Path is not a directory: %s", target_dir)
             sys.exit(1)
         
+        # The cache only saves work, scan without it if it cannot be opened
+        try:
+            cache = MetadataCache()
+        except (sqlite3.Error, OSError) as e:
+            process_logger.warning("Metadata cache unavailable, scanning without it: %s", e)
+            cache = None
+        
         # Run metadata extraction
-        manager = FileManager(target_dir)
-        manager.run(process_logger, metadata_logger)
+        try:
+            manager = FileManager(target_dir, cache=cache)
+            manager.run(process_logger, reporter)
+        finally:
+            if cache is not None:
+                cache.close()
         
         process_logger.info("\n✅ Process completed successfully!")
         
@@ -345,8 +1194,11 @@ def main():
         process_logger.info("\n\n⚠️  Process interrupted by user")
         sys.exit(130)
     except Exception as e:
-        process_logger.error(f"\n❌ Error during execution: {e}")
+        process_logger.error("\n❌ Error during execution: %s", e)
         sys.exit(1)
+    finally:
+        # Flush the buffered report on every exit path
+        reporter.close()
 
 
 if __name__ == "__main__":